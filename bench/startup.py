@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: latin-1 -*- ######################################################
+#                                                                              #
+# startup.py - measure wordlistctl startup time for lightweight commands.      #
+#                                                                              #
+# DESCRIPTION                                                                  #
+# Runs each command several times, reports the median wall time and the        #
+# slowest imports according to python -X importtime, and fails if a command    #
+# exceeds the given budget so regressions show up in CI.                       #
+#                                                                              #
+################################################################################
+
+
+import getopt
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+__script__ = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.realpath(__file__))), "wordlistctl.py")
+__runs__ = 10
+__top__ = 5
+__budget__ = 0
+__commands__ = [
+    ["-V"],
+    ["-H"],
+    ["-c", "?"],
+    ["-S", "rockyou"],
+    ["-s", "rockyou"]
+]
+
+
+def usage():
+    __usage__ = "usage:\n\n"
+    __usage__ += "  startup.py [-n <num>] [-k <num>] [-m <ms>]\n\n"
+    __usage__ += "options:\n\n"
+    __usage__ += f"  -n <num>   - runs per command (default: {__runs__})\n"
+    __usage__ += f"  -k <num>   - slowest imports to show (default: {__top__})\n"
+    __usage__ += "  -m <ms>    - fail if a median exceeds <ms> milliseconds\n"
+    __usage__ += "  -H         - print this help and exit\n"
+    print(__usage__)
+
+
+def run(args, importtime=False):
+    cmd = [sys.executable]
+    if importtime:
+        cmd += ["-X", "importtime"]
+    cmd += [__script__, "-C"] + args
+    start = time.perf_counter()
+    proc = subprocess.run(cmd, stdout=subprocess.DEVNULL,
+                          stderr=subprocess.PIPE, stdin=subprocess.DEVNULL,
+                          universal_newlines=True)
+    return time.perf_counter() - start, proc.stderr
+
+
+def slowest_imports(stderr, count):
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # only top level imports, nested ones are part of their parent
+        if name.startswith(" ") and not name.startswith("  "):
+            imports.append((int(cumulative), name.strip()))
+    imports.sort(reverse=True)
+    return imports[:count]
+
+
+def bench(args):
+    times = []
+    for _ in range(__runs__):
+        elapsed, _ = run(args)
+        times.append(elapsed)
+    median = statistics.median(times) * 1000
+    _, stderr = run(args, importtime=True)
+    print(f"wordlistctl {' '.join(args)}: {median:.1f} ms "
+          f"(min {min(times) * 1000:.1f} ms)")
+    for cumulative, name in slowest_imports(stderr, __top__):
+        print(f"    {cumulative / 1000:8.1f} ms  {name}")
+    return median
+
+
+def main(argv):
+    global __runs__
+    global __top__
+    global __budget__
+    try:
+        opts, _ = getopt.getopt(argv[1:], "Hn:k:m:")
+        for opt, arg in opts:
+            if opt == "-H":
+                usage()
+                return 0
+            elif opt == "-n":
+                __runs__ = int(arg)
+            elif opt == "-k":
+                __top__ = int(arg)
+            elif opt == "-m":
+                __budget__ = float(arg)
+    except (getopt.GetoptError, ValueError) as ex:
+        print(f"Error while parsing arguments: {str(ex)}", file=sys.stderr)
+        return -1
+
+    res = 0
+    tmpdir = tempfile.mkdtemp()
+    for args in __commands__:
+        if args[0] == "-s":
+            args = args + ["-d", tmpdir]
+        median = bench(args)
+        if __budget__ > 0 and median > __budget__:
+            print(f"    over budget ({__budget__:.1f} ms)", file=sys.stderr)
+            res = 1
+    shutil.rmtree(tmpdir)
+    return res
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
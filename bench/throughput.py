@@ -0,0 +1,563 @@
+#!/usr/bin/env python3
+# -*- coding: latin-1 -*- ######################################################
+#                                                                              #
+# throughput.py - measure wordlistctl download and decompression throughput.   #
+#                                                                              #
+# DESCRIPTION                                                                  #
+# Generates synthetic wordlists and compressed variants with a matching        #
+# catalog, serves them from a local http server with range support and         #
+# configurable latency and bandwidth (web seeded torrents optionally), then    #
+# reports throughput and peak memory of fetch_file, integrity_check,           #
+# decompress_gbl and decompress_archive and of whole wordlistctl runs.         #
+# Fails if a run errors or -K does not exit non-zero on a corrupted list.      #
+#                                                                              #
+################################################################################
+
+
+import bz2
+import getopt
+import gzip
+import hashlib
+import http.server
+import json
+import lzma
+import os
+import random
+import resource
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import types
+import warnings
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stderr
+from contextlib import redirect_stdout
+from multiprocessing import get_context
+
+__script__ = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.realpath(__file__))), "wordlistctl.py")
+__formats__ = ("txt", "gz", "bz2", "xz", "zip", "7z", "rar")
+__count__ = 4
+__size__ = 16777216
+__latency__ = 0
+__bandwidth__ = 0
+__ranges__ = True
+__torrents__ = False
+__keep__ = False
+__runs__ = []
+__seed__ = 1337
+
+
+def usage():
+    __usage__ = "usage:\n\n"
+    __usage__ += "  throughput.py [options] [-e <args>]...\n\n"
+    __usage__ += "options:\n\n"
+    __usage__ += f"  -n <num>   - wordlists per format (default: {__count__})\n"
+    __usage__ += "  -s <size>  - size of each wordlist, e.g. 64M (default: 16M)\n"
+    __usage__ += "  -f <str>   - comma separated formats out of " \
+        f"{','.join(__formats__)} (default: all available)\n"
+    __usage__ += "  -l <ms>    - latency of every request in milliseconds (default: 0)\n"
+    __usage__ += "  -b <size>  - bandwidth of every connection per second (default: unlimited)\n"
+    __usage__ += "  -r         - serve without range support\n"
+    __usage__ += "  -T         - also serve web seeded torrents of the plain wordlists\n"
+    __usage__ += "  -e <args>  - wordlistctl arguments of an end-to-end run, repeatable\n"
+    __usage__ += "  -k         - keep the work directory\n"
+    __usage__ += "  -H         - print this help and exit\n\n"
+    __usage__ += "example:\n\n"
+    __usage__ += "  # compare 5 and 20 parallel downloads over a 10 MB/s, 50 ms link\n"
+    __usage__ += "  $ throughput.py -l 50 -b 10M -e \"-t 5\" -e \"-t 20 -M\"\n"
+    print(__usage__)
+
+
+def load_wordlistctl():
+    # imported without running main() so the functions can be called one by
+    # one, and registered so the decompression workers can unpickle them
+    module = types.ModuleType("wordlistctl")
+    module.__file__ = __script__
+    sys.modules["wordlistctl"] = module
+    exec(compile(open(__script__).read(), __script__, "exec"),
+         module.__dict__)
+    return module
+
+
+def to_size(string):
+    units = {"k": 1000, "m": 1000 ** 2, "g": 1000 ** 3, "t": 1000 ** 4}
+    string = string.strip().lower().rstrip("b")
+    if string[-1:] in units:
+        return int(float(string[:-1]) * units[string[-1]])
+    return int(string)
+
+
+def to_readable_size(size):
+    for unit in ("bytes", "Kbytes", "Mbytes", "Gbytes"):
+        if size < 1000:
+            break
+        size /= 1000
+    return f"{size:.2f} {unit}"
+
+
+def available_formats():
+    formats = ["txt", "gz", "bz2", "xz", "zip"]
+    try:
+        import libarchive
+        formats.append("7z")
+    except ImportError:
+        pass
+    if shutil.which("rar") is not None:
+        formats.append("rar")
+    return formats
+
+
+def make_wordlist(path, size, rng):
+    vocabulary = ["".join(rng.choices("abcdefghijklmnopqrstuvwxyz0123456789",
+                                      k=rng.randint(4, 14)))
+                  for _ in range(65536)]
+    fp = open(path, "w")
+    written = 0
+    while written < size:
+        block = "\n".join(rng.choices(vocabulary, k=65536)) + "\n"
+        block = block[:size - written]
+        fp.write(block)
+        written += block.__len__()
+    fp.close()
+
+
+def compress(path, kind):
+    outfile = f"{path}.{kind}"
+    if kind == "gz":
+        with open(path, "rb") as src, gzip.open(outfile, "wb") as dst:
+            shutil.copyfileobj(src, dst, 1048576)
+    elif kind == "bz2":
+        with open(path, "rb") as src, bz2.open(outfile, "wb") as dst:
+            shutil.copyfileobj(src, dst, 1048576)
+    elif kind == "xz":
+        with open(path, "rb") as src, lzma.open(outfile, "wb") as dst:
+            shutil.copyfileobj(src, dst, 1048576)
+    elif kind == "zip":
+        with zipfile.ZipFile(outfile, "w", zipfile.ZIP_DEFLATED) as dst:
+            dst.write(path, os.path.basename(path))
+    elif kind == "7z":
+        import libarchive
+        cwd = os.getcwd()
+        os.chdir(os.path.dirname(path))
+        try:
+            with libarchive.file_writer(outfile, "7zip") as dst:
+                dst.add_files(os.path.basename(path))
+        finally:
+            os.chdir(cwd)
+    elif kind == "rar":
+        subprocess.run(["rar", "a", "-ep", "-idq", outfile, path], check=True)
+    return outfile
+
+
+def make_torrent(path, seedurl):
+    import libtorrent
+    storage = libtorrent.file_storage()
+    libtorrent.add_files(storage, path)
+    torrent = libtorrent.create_torrent(storage)
+    torrent.add_url_seed(seedurl)
+    libtorrent.set_piece_hashes(torrent, os.path.dirname(path))
+    outfile = f"{path}.torrent"
+    with open(outfile, "wb") as fp:
+        fp.write(libtorrent.bencode(torrent.generate()))
+    return outfile
+
+
+def md5sum(path):
+    hashagent = hashlib.md5()
+    with open(path, "rb") as fp:
+        for data in iter(lambda: fp.read(1048576), b""):
+            hashagent.update(data)
+    return hashagent.hexdigest()
+
+
+def make_catalog(workdir, formats, baseurl):
+    rng = random.Random(__seed__)
+    www = f"{workdir}/www"
+    os.makedirs(f"{www}/seed")
+    outfiles = []
+    jobs = []
+    with ProcessPoolExecutor(os.cpu_count() or 1) as pool:
+        for i in range(__count__):
+            plain = f"{www}/bench{i}.txt"
+            make_wordlist(plain, __size__, rng)
+            if "txt" in formats:
+                outfiles.append(plain)
+            for kind in formats:
+                if kind == "txt":
+                    continue
+                # every variant unpacks to its own name, nothing is skipped
+                variant = f"{www}/bench{i}-{kind}.txt"
+                os.link(plain, variant)
+                jobs.append((variant, pool.submit(compress, variant, kind)))
+            if __torrents__:
+                seeded = f"{www}/seed/seeded{i}.txt"
+                os.link(plain, seeded)
+                outfiles.append(make_torrent(seeded, f"{baseurl}/seed/"))
+            if "txt" not in formats:
+                os.remove(plain)
+        for variant, job in jobs:
+            outfiles.append(job.result())
+            os.remove(variant)
+    files = []
+    for path in sorted(outfiles):
+        name = os.path.relpath(path, www)
+        prefix = "torrent+" if name.endswith(".torrent") else ""
+        files.append({"name": os.path.basename(name),
+                      "url": [f"{prefix}{baseurl}/{name}"],
+                      "sum": [md5sum(path)],
+                      "size": [os.path.getsize(path), __size__]})
+    catalog = {"bench": {"count": files.__len__(),
+                         "size": [sum(i["size"][0] for i in files),
+                                  sum(i["size"][1] for i in files)],
+                         "files": files}}
+    os.makedirs(f"{workdir}/app")
+    with open(f"{workdir}/app/config.json", "w") as fp:
+        json.dump(catalog, fp)
+    shutil.copy(__script__, f"{workdir}/app/wordlistctl.py")
+    return files
+
+
+class BenchHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    root = ""
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self.respond(False)
+
+    def do_GET(self):
+        self.respond(True)
+
+    def respond(self, body):
+        if __latency__ > 0:
+            time.sleep(__latency__ / 1000)
+        path = os.path.realpath(f"{self.root}/{self.path.split('?')[0]}")
+        if not path.startswith(self.root) or not os.path.isfile(path):
+            self.send_error(404)
+            return
+        size = os.path.getsize(path)
+        etag = f"\"{int(os.path.getmtime(path))}-{size}\""
+        start, end = 0, size - 1
+        rng = self.headers.get("Range", "")
+        partial = __ranges__ and rng.startswith("bytes=") and \
+            self.headers.get("If-Range", etag) == etag
+        if partial:
+            low, high = rng[6:].split(",")[0].split("-")
+            start = int(low) if low != "" else max(size - int(high), 0)
+            end = min(int(high), size - 1) if high != "" and low != "" \
+                else size - 1
+            if start > end:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        else:
+            self.send_response(200)
+        if __ranges__:
+            self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified",
+                         self.date_time_string(os.path.getmtime(path)))
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        if not body:
+            return
+        fp = open(path, "rb")
+        fp.seek(start)
+        left = end - start + 1
+        began = time.time()
+        sent = 0
+        try:
+            while left > 0:
+                data = fp.read(min(65536, left))
+                self.wfile.write(data)
+                left -= data.__len__()
+                sent += data.__len__()
+                if __bandwidth__ > 0:
+                    ahead = sent / __bandwidth__ - (time.time() - began)
+                    if ahead > 0:
+                        time.sleep(ahead)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            fp.close()
+
+
+def start_server(root):
+    BenchHandler.root = os.path.realpath(root)
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), BenchHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def current_rss():
+    try:
+        for line in open("/proc/self/status"):
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def reset_peak():
+    # only the peak of the measured call is of interest, not the inherited one
+    try:
+        with open("/proc/self/clear_refs", "w") as fp:
+            fp.write("5")
+    except OSError:
+        pass
+
+
+def measure(stage, workdir, paths):
+    wl = load_wordlistctl()
+    os.environ["ANSI_COLORS_DISABLED"] = "1"
+    wl.__wordlist_path__ = f"{workdir}/stage"
+    wl.__decompress__ = True
+    wl.__max_decompress__ = os.cpu_count() or 1
+    wl.__decompress_executer__ = ProcessPoolExecutor(wl.__max_decompress__)
+    wl.__rate_lock__ = threading.Lock()
+    wl.__metrics_lock__ = threading.Lock()
+    if stage == "integrity_check":
+        # fetch_file cached the digests it verified, forget them so the
+        # stage hashes again
+        db = wl.open_manifest()
+        db.execute("DELETE FROM verified")
+        db.commit()
+        db.close()
+    reset_peak()
+    baseline = current_rss()
+    size = 0
+    ok = True
+    start = time.perf_counter()
+    with open(os.devnull, "w") as null, redirect_stdout(null), \
+            redirect_stderr(null):
+        for url, path, checksum in paths:
+            if stage == "fetch_file":
+                ok = wl.fetch_file(url, path, checksum) and ok
+                size += os.path.getsize(path) if os.path.isfile(path) else 0
+            elif stage == "integrity_check":
+                ok = wl.integrity_check(checksum, path) and ok
+                size += os.path.getsize(path)
+            else:
+                ok = getattr(wl, stage)(path) and ok
+                size += __size__
+    elapsed = time.perf_counter() - start
+    wl.__decompress_executer__.shutdown(wait=True)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return ok, size, elapsed, max(peak, children)
+
+
+def bench_stages(workdir, files, baseurl):
+    os.makedirs(f"{workdir}/stage")
+    downloads = []
+    for i in files:
+        if not i["url"][0].startswith("http"):
+            continue
+        name = i["name"]
+        downloads.append((i["url"][0], f"{workdir}/stage/{name}",
+                          i["sum"][0]))
+    compressed = [i for i in downloads if i[1].endswith((".gz", ".bz2",
+                                                          ".xz"))]
+    archives = [i for i in downloads if i[1].endswith((".zip", ".7z",
+                                                       ".rar"))]
+    results = []
+    for stage, paths in [("fetch_file", downloads),
+                         ("integrity_check", downloads),
+                         ("decompress_gbl", compressed),
+                         ("decompress_archive", archives)]:
+        if paths.__len__() == 0:
+            continue
+        # a fresh process per stage, so peak memory belongs to the stage
+        with ProcessPoolExecutor(1, mp_context=get_context("fork")) as pool:
+            ok, size, elapsed, peak = pool.submit(
+                measure, stage, workdir, paths).result()
+        results.append((stage, paths.__len__(), size, elapsed, peak, ok))
+    return results
+
+
+def bench_run(workdir, args):
+    outdir = tempfile.mkdtemp(dir=workdir)
+    metrics = f"{outdir}.json"
+    cmd = [sys.executable, f"{workdir}/app/wordlistctl.py", "-C", "-N",
+           "-d", outdir, "-f", "0", "-X", "-J", metrics] + args
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.DEVNULL,
+                            stdin=subprocess.DEVNULL)
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    elapsed = time.perf_counter() - start
+    snapshot = {}
+    try:
+        with open(metrics) as fp:
+            snapshot = json.loads(fp.readlines()[-1])
+    except (OSError, IndexError, ValueError):
+        pass
+    shutil.rmtree(outdir, ignore_errors=True)
+    return proc.returncode, elapsed, usage.ru_maxrss, snapshot
+
+
+def bench_verify(workdir, files):
+    # -K must pass on a fresh download and fail once a list is corrupted
+    outdir = tempfile.mkdtemp(dir=workdir)
+    cmd = [sys.executable, f"{workdir}/app/wordlistctl.py", "-C", "-N",
+           "-d", outdir]
+    codes = []
+    elapsed = 0
+    try:
+        for args in (["-f", "0"], ["-K"], ["-K"]):
+            if codes.__len__() == 2:
+                name = [i["name"] for i in files
+                        if i["url"][0].startswith("http")][0]
+                with open(f"{outdir}/bench/{name}", "r+b") as fp:
+                    fp.seek(os.fstat(fp.fileno()).st_size // 2)
+                    byte = fp.read(1)
+                    fp.seek(-1, os.SEEK_CUR)
+                    fp.write(bytes([byte[0] ^ 0xff]))
+            start = time.perf_counter()
+            codes.append(subprocess.run(
+                cmd + args, stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                stdin=subprocess.DEVNULL).returncode)
+            elapsed = time.perf_counter() - start
+    finally:
+        shutil.rmtree(outdir, ignore_errors=True)
+    return codes, elapsed
+
+
+def report_header():
+    print(f"  {'stage':<20} {'files':>5} {'size':>14} {'time':>9} "
+          f"{'rate':>16} {'peak rss':>14}")
+
+
+def report(stage, count, size, elapsed, peak, note=""):
+    rate = to_readable_size(size / elapsed if elapsed > 0 else 0) + "/s"
+    print(f"  {stage:<20} {count:>5} {to_readable_size(size):>14} "
+          f"{elapsed:>8.2f}s {rate:>16} "
+          f"{to_readable_size(peak * 1024):>14}{note}")
+
+
+def main(argv):
+    global __count__
+    global __size__
+    global __latency__
+    global __bandwidth__
+    global __ranges__
+    global __torrents__
+    global __keep__
+    global __runs__
+    warnings.simplefilter("ignore")
+    formats = available_formats()
+    try:
+        opts, _ = getopt.getopt(argv[1:], "HrTkn:s:f:l:b:e:")
+        for opt, arg in opts:
+            if opt == "-H":
+                usage()
+                return 0
+            elif opt == "-n":
+                __count__ = int(arg)
+            elif opt == "-s":
+                __size__ = to_size(arg)
+            elif opt == "-f":
+                for kind in arg.split(","):
+                    if kind not in formats:
+                        raise ValueError(f"{kind} is not an available format")
+                formats = arg.split(",")
+            elif opt == "-l":
+                __latency__ = float(arg)
+            elif opt == "-b":
+                __bandwidth__ = to_size(arg)
+            elif opt == "-r":
+                __ranges__ = False
+            elif opt == "-T":
+                __torrents__ = True
+            elif opt == "-k":
+                __keep__ = True
+            elif opt == "-e":
+                __runs__.append(shlex.split(arg))
+        if __count__ <= 0 or __size__ <= 0:
+            raise ValueError("wordlist count and size can't be less than 1")
+        if __torrents__:
+            import libtorrent
+    except (getopt.GetoptError, ValueError, ImportError) as ex:
+        print(f"Error while parsing arguments: {str(ex)}", file=sys.stderr)
+        return -1
+    if __runs__.__len__() == 0:
+        __runs__.append([])
+
+    workdir = tempfile.mkdtemp(prefix="wordlistctl-bench-")
+    # catalog, mirror history and resolved links must not leak between runs
+    os.environ["XDG_CACHE_HOME"] = f"{workdir}/cache"
+    os.makedirs(f"{workdir}/cache/wordlistctl")
+    res = 0
+    try:
+        server = start_server(f"{workdir}/www")
+        baseurl = f"http://127.0.0.1:{server.server_address[1]}"
+        start = time.perf_counter()
+        files = make_catalog(workdir, formats, baseurl)
+        print(f"generated {files.__len__()} files of {__count__} "
+              f"{to_readable_size(__size__)} wordlists "
+              f"({','.join(formats)}) in {time.perf_counter() - start:.1f}s")
+        link = "unlimited" if __bandwidth__ <= 0 else \
+            f"{to_readable_size(__bandwidth__)}/s"
+        print(f"serving {baseurl} with {__latency__:.0f} ms latency, {link} "
+              f"per connection, ranges {'on' if __ranges__ else 'off'}\n")
+
+        print("functions:\n")
+        report_header()
+        for stage, count, size, elapsed, peak, ok in bench_stages(
+                workdir, files, baseurl):
+            report(stage, count, size, elapsed, peak,
+                   "" if ok else "  (errors)")
+            if not ok:
+                res = 1
+
+        print("\nend-to-end (-f 0 -X):\n")
+        for args in __runs__:
+            code, elapsed, peak, snapshot = bench_run(workdir, args)
+            print(f"  wordlistctl {' '.join(args)}".rstrip() + ":")
+            report_header()
+            report("total", snapshot.get("done", 0),
+                   snapshot.get("bytes", 0), elapsed, peak,
+                   "" if code == 0 else f"  (exit {code})")
+            for stage, value in snapshot.get("stages", {}).items():
+                if value["count"] > 0:
+                    print(f"  {stage:<20} {value['count']:>5} "
+                          f"{'':>14} {value['seconds']:>8.2f}s")
+            print()
+            if code != 0 or snapshot.get("failed", 0) > 0:
+                res = 1
+
+        print("verify-all (-K):\n")
+        codes, elapsed = bench_verify(workdir, files)
+        ok = codes[:2] == [0, 0] and codes[2] != 0
+        print(f"  download exit {codes[0]}, clean tree exit {codes[1]}, "
+              f"corrupted list exit {codes[2]} ({elapsed:.2f}s)"
+              f"{'' if ok else '  (errors)'}")
+        if not ok:
+            res = 1
+        server.shutdown()
+    finally:
+        if __keep__:
+            print(f"work directory kept in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return res
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))